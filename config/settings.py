@@ -1,13 +1,14 @@
 from pathlib import Path
 import os
-from dotenv import load_dotenv
 import dj_database_url   # لإعداد قاعدة البيانات من DATABASE_URL
 
-# تحميل متغيرات البيئة من .env (محلياً)
-load_dotenv()
-
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# تحميل متغيرات البيئة من .env (محلياً) — لا نستورد dotenv إن لم يوجد الملف
+if (BASE_DIR / ".env").exists():
+    from dotenv import load_dotenv
+    load_dotenv(BASE_DIR / ".env")
+
 # ----------------- أمان/بيئة -----------------
 DEBUG = os.getenv("DEBUG", "False").lower() == "true"
 SECRET_KEY = os.getenv("SECRET_KEY", "unsafe-secret")
@@ -31,12 +32,16 @@ INSTALLED_APPS = [
 
     # تطبيقات المشروع
     "products",
-
-    # Cloudinary للتخزين السحابي
-    "cloudinary",
-    "cloudinary_storage",
 ]
 
+# ----------------- Cloudinary -----------------
+# لا نضيف cloudinary/cloudinary_storage إلى INSTALLED_APPS: لا نستخدم وسومهم في القوالب
+# ولا collectstatic الخاص بهم (الملفات الثابتة عبر whitenoise)، فتُستورد المكتبة
+# فقط عند أول استخدام للتخزين (STORAGES كسول) أو في warm_up مع preload_app.
+CLOUDINARY_URL = os.getenv("CLOUDINARY_URL", "")
+USE_CLOUDINARY = bool(CLOUDINARY_URL)
+# غيابه في الإنتاج خطأ يكشفه "manage.py check --deploy" (products/checks.py) لا استيراد الإعدادات
+
 # ----------------- Middleware -----------------
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
@@ -78,6 +83,19 @@ DATABASES = {
     )
 }
 
+# ----------------- الكاش -----------------
+# كاش مشترك بين العمال (Redis) — تعتمد عليه حدود طلبات البيع وسقف المعالجة والعدّادات.
+# بدونه لكل عملية كاش محلي فيصبح الحد "لكل IP" مضروبًا في عدد العمال، لذا غيابه
+# في الإنتاج خطأ يكشفه "manage.py check --deploy" (products/checks.py).
+REDIS_URL = os.getenv("REDIS_URL", "")
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+
 # ----------------- الملفات الثابتة -----------------
 STATIC_URL = "/static/"
 STATIC_ROOT = BASE_DIR / "staticfiles"
@@ -89,7 +107,10 @@ STORAGES = {
         "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage"
     },
     "default": {
-        "BACKEND": "cloudinary_storage.storage.MediaCloudinaryStorage"
+        "BACKEND": (
+            "cloudinary_storage.storage.MediaCloudinaryStorage" if USE_CLOUDINARY
+            else "django.core.files.storage.FileSystemStorage"
+        )
     },
 }
 
@@ -97,9 +118,6 @@ STORAGES = {
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
-# ----------------- Cloudinary -----------------
-CLOUDINARY_URL = os.getenv("CLOUDINARY_URL", "")
-
 # ----------------- إعدادات تيليجرام للتنبيهات -----------------
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "")
 TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID", "")
@@ -108,6 +126,33 @@ TELEGRAM_ENABLED = (
     and bool(TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID)
 )
 
+# ----------------- ترتيب "الأكثر طلبًا" -----------------
+# تغيير أي قيمة هنا يتطلب: python manage.py recompute_popularity
+POPULARITY_HALF_LIFE_DAYS = float(os.getenv("POPULARITY_HALF_LIFE_DAYS", "14"))
+POPULARITY_SELL_WEIGHT = 5.0
+POPULARITY_CLICK_WEIGHT = 1.0
+# نقرة واحدة لكل IP/منتج خلال هذه المدة، وحد أقصى لنقرات كل IP
+POPULARITY_CLICK_DEDUP_SECONDS = int(os.getenv("POPULARITY_CLICK_DEDUP_SECONDS", "3600"))
+POPULARITY_CLICK_IP_RATE = os.getenv("POPULARITY_CLICK_IP_RATE", "30/h")
+
+# ----------------- اقتراحات البحث -----------------
+# أقصى مدة (ثوانٍ) قبل إعادة فحص نسخة الكتالوج لإعادة بناء الفهرس
+SEARCH_INDEX_CHECK_SECONDS = int(os.getenv("SEARCH_INDEX_CHECK_SECONDS", "30"))
+
+# ----------------- حماية طلبات البيع من الإساءة -----------------
+# الصيغة: "عدد/مدة" مثل "10/h" أو "5/10m" (سعة الدلو ومدة امتلائه)
+SELL_THROTTLE_IP_RATE = os.getenv("SELL_THROTTLE_IP_RATE", "10/h")
+SELL_THROTTLE_PHONE_RATE = os.getenv("SELL_THROTTLE_PHONE_RATE", "3/h")
+# أقصى عدد طلبات بيع قيد المعالجة (رفع + حفظ + تنبيه) في كل العمال معًا
+SELL_MAX_CONCURRENT_UPLOADS = int(os.getenv("SELL_MAX_CONCURRENT_UPLOADS", "4"))
+# عدد البروكسيات أمام التطبيق (Render = 1) لاستخراج IP العميل من X-Forwarded-For
+THROTTLE_NUM_PROXIES = int(os.getenv("THROTTLE_NUM_PROXIES", "0" if DEBUG else "1"))
+
+# ----------------- حدود الإقلاع (python manage.py profile_startup) -----------------
+# تُطبَّق على العامل: زمن إقلاعه (بعد fork مع --warm) وذاكرته الخاصة Private_Dirty بالميغابايت
+STARTUP_MAX_BOOT_MS = float(os.getenv("STARTUP_MAX_BOOT_MS", "0")) or None
+STARTUP_MAX_RSS_MB = float(os.getenv("STARTUP_MAX_RSS_MB", "0")) or None
+
 # ----------------- LOGGING -----------------
 LOGGING = {
     "version": 1,
@@ -0,0 +1,37 @@
+# config/startup.py
+"""
+تهيئة الإقلاع لعمال gunicorn.
+
+في الوضع العادي (runserver، أوامر manage.py، عامل بلا preload) نؤجل تحميل
+مرسلات تيليجرام (requests) وعميل التخزين حتى أول استخدام.
+مع preload_app=True نحمّلها مرة واحدة في العملية الأم قبل التفرّع حتى تتشاركها
+كل العمال عبر copy-on-write بدل أن يدفع كل عامل كلفتها من جديد.
+"""
+import gc
+
+
+def warm_up() -> None:
+    """تحميل كل ما نؤجله عادة — بدون أي اتصال بقاعدة البيانات أو الشبكة."""
+    from django.core.files.storage import storages
+    from django.template.loader import get_template
+    from django.urls import get_resolver
+
+    from products import notify  # noqa: F401 — يجرّ معه requests
+
+    get_resolver().url_patterns  # استيراد config.urls و products.views
+    storages["default"]
+    get_template("landing.html")  # تُخزَّن مترجمة عند DEBUG=False
+
+
+def prepare_for_fork() -> None:
+    """
+    تُستدعى في العملية الأم بعد تحميل التطبيق مباشرة قبل إنشاء العمال.
+    gc.freeze ينقل الكائنات الحالية لجيل دائم فلا يلمس GC في العمال
+    عدّاداتها، فتبقى صفحات الذاكرة مشتركة.
+    """
+    from django.db import connections
+
+    warm_up()
+    connections.close_all()  # لا نورّث اتصالات قاعدة البيانات للعمال
+    gc.collect()
+    gc.freeze()
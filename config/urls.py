@@ -2,12 +2,23 @@ from django.contrib import admin
 from django.urls import path
 from django.conf import settings
 from django.conf.urls.static import static
-from products.views import landing_page, create_sell_request
+from products.views import (
+    create_sell_request,
+    landing_page,
+    product_click,
+    robots_txt,
+    search_suggestions,
+    sell_request_metrics,
+)
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("", landing_page, name="landing"),
+    path("robots.txt", robots_txt, name="robots_txt"),
     path("sell/", create_sell_request, name="sell_request"),
+    path("p/<int:pk>/click/", product_click, name="product_click"),
+    path("search/suggest/", search_suggestions, name="search_suggest"),
+    path("ops/sell-metrics/", sell_request_metrics, name="sell_request_metrics"),
 ]
 
 if settings.DEBUG:
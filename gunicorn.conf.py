@@ -0,0 +1,47 @@
+# gunicorn.conf.py
+"""
+إعدادات gunicorn للإنتاج (gunicorn -c gunicorn.conf.py config.wsgi:application).
+
+- preload_app: يُحمَّل Django مرة في العملية الأم ثم تتفرّع العمال منها، فيصبح
+  إقلاع العامل الجديد (إعادة التدوير/التوسّع) شبه فوري وتُشارَك الذاكرة بينها.
+  عطّله بـ GUNICORN_PRELOAD=false إذا احتجت إعادة تحميل الكود بـ HUP.
+- GC: نعطّله في الأم أثناء التحميل حتى لا يترك فراغات في الصفحات، ونجمّد
+  الكائنات قبل التفرّع (config.startup) ثم نعيد تفعيله — كما يوصي توثيق gc.freeze.
+  إعادة التحميل بـ HUP تعيد تنفيذ هذا الملف (فيتعطّل GC ثانية) دون when_ready،
+  لذا نعيد تفعيله أيضًا في on_reload وفي كل عامل بعد التفرّع.
+- threads: عامل gthread بعدة خيوط، فيُعالج كل عامل أكثر من طلب بالتوازي
+  (رفع الصور ينتظر الشبكة)، ويصبح SELL_MAX_CONCURRENT_UPLOADS سقفًا فعليًا.
+- max_requests: إعادة تدوير العمال دوريًا لاحتواء أي تسرّب ذاكرة.
+
+فحص زمن الإقلاع والذاكرة: python manage.py profile_startup --warm
+"""
+import gc
+import os
+
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = 100
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+errorlog = "-"
+
+if preload_app:
+    gc.disable()
+
+
+def when_ready(server):
+    if preload_app:
+        from config.startup import prepare_for_fork
+
+        prepare_for_fork()
+        gc.enable()
+        server.log.info("App preloaded; %s objects frozen for copy-on-write", gc.get_freeze_count())
+
+
+def on_reload(server):
+    gc.enable()
+
+
+def post_fork(server, worker):
+    gc.enable()
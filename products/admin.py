@@ -6,10 +6,10 @@ from .models import Product, SellRequest
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     # اعرض معلومات المنتج الفعلية فقط
-    list_display = ("name", "category", "price", "is_active", "created_at")
+    list_display = ("name", "category", "price", "is_active", "click_count", "created_at")
     list_filter = ("category", "is_active", "created_at")
     search_fields = ("name", "details")
-    readonly_fields = ("created_at", "updated_at")
+    readonly_fields = ("click_count", "created_at", "updated_at")
     ordering = ("-created_at",)
     date_hierarchy = "created_at"
     list_per_page = 25
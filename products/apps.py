@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ProductsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'products'
+
+    def ready(self):
+        from . import checks, popularity  # noqa: F401 — تسجيل فحوص النشر وإشارات درجة الشعبية
+
+        popularity.check_half_life()
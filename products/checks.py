@@ -0,0 +1,41 @@
+# products/checks.py
+"""
+فحوص النشر (python manage.py check --deploy) — بدل الرفع عند استيراد الإعدادات
+حتى تبقى أوامر manage.py تعمل في أي بيئة، ويفشل البناء على Render وحده.
+"""
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+
+@register(Tags.security, deploy=True)
+def check_media_storage(app_configs, **kwargs):
+    # قرص Render مؤقت: التخزين المحلي في الإنتاج يضيّع صور الإثبات بصمت
+    if settings.DEBUG or settings.USE_CLOUDINARY:
+        return []
+    return [
+        Error(
+            "CLOUDINARY_URL is required when DEBUG=False.",
+            hint="Media on the local disk is lost on every deploy; set CLOUDINARY_URL.",
+            id="products.E001",
+        )
+    ]
+
+
+# كاشات لا تشاركها العمال: الحدود والسقف والعدّادات تصبح لكل عملية
+_PROCESS_LOCAL_CACHES = {
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+}
+
+
+@register(Tags.security, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    if settings.DEBUG or settings.CACHES["default"]["BACKEND"] not in _PROCESS_LOCAL_CACHES:
+        return []
+    return [
+        Error(
+            "REDIS_URL is required when DEBUG=False (shared throttling cache).",
+            hint="Without a shared cache every worker enforces its own sell-request limits.",
+            id="products.E002",
+        )
+    ]
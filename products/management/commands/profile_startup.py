@@ -0,0 +1,123 @@
+# products/management/commands/profile_startup.py
+import json
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# يُشغَّل في عملية Python جديدة تمامًا. بدون --warm هي نفسها العامل (وضع lazy).
+# مع --warm هي العملية الأم كما في preload_app: تحمّل التطبيق وتجهّزه ثم تتفرّع،
+# ونقيس العامل المتفرّع نفسه: زمن جاهزيته بعد fork وذاكرته الخاصة (Private_Dirty)
+# — ما لا يُشارك مع الأم عبر copy-on-write وتدفعه كل عملية عامل فعلًا.
+_CHILD = """
+import gc, json, os, resource, time
+
+def memory_kb():
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            fields = dict(line.split()[:2] for line in f if line.rstrip().endswith(" kB"))
+        return int(fields["Rss:"]), int(fields["Private_Dirty:"])
+    except (OSError, KeyError):
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss, rss
+
+t0 = time.perf_counter()
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+if {warm}:
+    gc.disable()  # كما في gunicorn.conf.py مع preload_app
+from config.wsgi import application
+result = {{}}
+if {warm}:
+    from config.startup import prepare_for_fork
+    prepare_for_fork()
+    gc.enable()
+    result["master_ms"] = (time.perf_counter() - t0) * 1000
+    result["master_rss_kb"] = memory_kb()[0]
+    read_fd, write_fd = os.pipe()
+    t0 = time.perf_counter()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        gc.enable()  # post_fork
+        gc.collect()
+        rss_kb, private_kb = memory_kb()
+        worker = {{"boot_ms": (time.perf_counter() - t0) * 1000, "rss_kb": rss_kb, "private_kb": private_kb}}
+        os.write(write_fd, json.dumps(worker).encode())
+        os._exit(0)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as f:
+        result.update(json.loads(f.read()))
+    os.waitpid(pid, 0)
+else:
+    rss_kb, private_kb = memory_kb()
+    result.update(boot_ms=(time.perf_counter() - t0) * 1000, rss_kb=rss_kb, private_kb=private_kb)
+print(json.dumps(result))
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "قياس زمن إقلاع عامل gunicorn وذاكرته الخاصة (Private_Dirty) مع أثقل الحزم استيرادًا، "
+        "والفشل إذا تجاوز العامل الحدود (STARTUP_MAX_BOOT_MS / STARTUP_MAX_RSS_MB)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=3, help="عدد مرات القياس (نأخذ الوسيط)")
+        parser.add_argument("--top", type=int, default=15, help="عدد الحزم الأثقل في التقرير")
+        parser.add_argument("--warm", action="store_true", help="وضع preload_app: تجهيز العملية الأم ثم قياس العامل بعد fork")
+        parser.add_argument("--max-boot-ms", type=float, default=settings.STARTUP_MAX_BOOT_MS)
+        parser.add_argument("--max-rss-mb", type=float, default=settings.STARTUP_MAX_RSS_MB)
+
+    def _run_child(self, warm: bool, importtime: bool = False) -> subprocess.CompletedProcess:
+        cmd = [sys.executable]
+        if importtime:
+            cmd += ["-X", "importtime"]
+        cmd += ["-c", _CHILD.format(warm=warm)]
+        proc = subprocess.run(cmd, cwd=settings.BASE_DIR, capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise CommandError(f"Worker boot failed:\n{proc.stderr[-2000:]}")
+        return proc
+
+    def _import_breakdown(self, stderr: str) -> list[tuple[str, int]]:
+        """تجميع زمن الاستيراد الذاتي (بالميكروثانية) حسب الحزمة الجذرية."""
+        totals: dict[str, int] = defaultdict(int)
+        for line in stderr.splitlines():
+            if not line.startswith("import time:") or "self [us]" in line:
+                continue
+            self_us, _, name = line[len("import time:"):].split("|")
+            totals[name.strip().split(".")[0]] += int(self_us)
+        return sorted(totals.items(), key=lambda kv: kv[1], reverse=True)
+
+    def handle(self, *args, **options):
+        warm = options["warm"]
+        samples = [json.loads(self._run_child(warm).stdout.strip().splitlines()[-1]) for _ in range(options["runs"])]
+
+        def median(key, scale=1):
+            return statistics.median(s[key] for s in samples) / scale
+
+        boot_ms, private_mb = median("boot_ms"), median("private_kb", 1024)
+        self.stdout.write(f"mode:     {'preload (warm, forked worker)' if warm else 'lazy'}")
+        if warm:
+            self.stdout.write(
+                f"master:   boot {median('master_ms'):.0f} ms, RSS {median('master_rss_kb', 1024):.1f} MiB"
+            )
+        self.stdout.write(
+            f"worker:   boot {boot_ms:.0f} ms{' after fork' if warm else ''}, "
+            f"private {private_mb:.1f} MiB, RSS {median('rss_kb', 1024):.1f} MiB "
+            f"(median of {len(samples)})"
+        )
+        self.stdout.write("heaviest imports (self time by top-level package):")
+        for name, us in self._import_breakdown(self._run_child(warm, importtime=True).stderr)[: options["top"]]:
+            self.stdout.write(f"  {us / 1000:8.1f} ms  {name}")
+
+        errors = []
+        if options["max_boot_ms"] and boot_ms > options["max_boot_ms"]:
+            errors.append(f"worker boot {boot_ms:.0f} ms > {options['max_boot_ms']:.0f} ms")
+        if options["max_rss_mb"] and private_mb > options["max_rss_mb"]:
+            errors.append(f"worker private memory {private_mb:.1f} MiB > {options['max_rss_mb']:.1f} MiB")
+        if errors:
+            raise CommandError("Startup budget exceeded: " + "; ".join(errors))
+        self.stdout.write(self.style.SUCCESS("Startup within budget."))
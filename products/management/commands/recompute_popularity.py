@@ -0,0 +1,12 @@
+# products/management/commands/recompute_popularity.py
+from django.core.management.base import BaseCommand
+
+from products.popularity import recompute_all
+
+
+class Command(BaseCommand):
+    help = "إعادة احتساب درجة الشعبية (الأكثر طلبًا) لكل المنتجات — تُشغَّل دوريًا."
+
+    def handle(self, *args, **options):
+        updated = recompute_all()
+        self.stdout.write(self.style.SUCCESS(f"تم تحديث {updated} منتج."))
@@ -0,0 +1,69 @@
+# products/management/commands/search_index_report.py
+import random
+import statistics
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from products.search import PrefixIndex, _build, catalog_version
+
+_WORDS = (
+    "آيفون", "ايباد", "سامسونج", "جالكسي", "شاومي", "هواوي", "ماك", "بوك", "برو", "ماكس",
+    "الترا", "بلس", "لابتوب", "ديل", "لينوفو", "بلايستيشن", "اكس", "بوكس", "نينتندو", "سويتش",
+    "سماعة", "شاحن", "كيبورد", "ماوس", "شاشة", "ساعة", "ذكية", "جديد", "مستعمل", "اسود",
+    "ابيض", "ذهبي", "iPhone", "Galaxy", "MacBook", "Pro", "Max", "Ultra", "PS5", "RTX",
+)
+_QUERIES = (
+    "ا", "اي", "ايف", "سام", "جالكسي الت", "ماك بو", "ps", "برو ماكس", "شا", "1", "12",
+    # كلمات شائعة كلها أو بلا تطابق مشترك — أسوأ حالة للترشيح
+    "1 x", "ابيض اسود ذهبي ديل", "1 2 3", "ا ب", "جديد مستعمل",
+)
+
+
+class Command(BaseCommand):
+    help = "تقرير حجم فهرس الاقتراحات في الذاكرة وزمن الاستعلام (بيانات تجريبية أو الكتالوج الفعلي)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=100_000, help="عدد المنتجات التجريبية")
+        parser.add_argument("--from-db", action="store_true", help="استخدام الكتالوج الفعلي بدل البيانات التجريبية")
+        parser.add_argument("--rounds", type=int, default=2000, help="عدد مرات تكرار كل استعلام")
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        if not options["from_db"]:
+            n = options["products"]
+            entries = [
+                (i, " ".join(rng.sample(_WORDS, rng.randint(2, 5))) + f" {rng.randint(1, 999)}")
+                for i in range(n)
+            ]
+
+        tracemalloc.start()
+        base = tracemalloc.get_traced_memory()[0]
+        t0 = time.perf_counter()
+        if options["from_db"]:
+            index = _build(catalog_version())
+        else:
+            # نسخ الأسماء داخل منطقة التتبّع: الفهرس يحتفظ بها فهي جزء من حجمه
+            index = PrefixIndex((pk, name.encode().decode()) for pk, name in entries)
+        build_s = time.perf_counter() - t0
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        self.stdout.write(f"products:        {len(index):,}")
+        self.stdout.write(f"distinct tokens: {len(index.tokens):,}")
+        self.stdout.write(f"hot prefixes:    {len(index.hot):,}")
+        self.stdout.write(f"build time:      {build_s:.2f} s")
+        self.stdout.write(f"index memory:    {(current - base) / 2**20:.1f} MiB (peak {(peak - base) / 2**20:.1f} MiB)")
+
+        for q in _QUERIES:
+            samples = []
+            for _ in range(options["rounds"]):
+                t = time.perf_counter()
+                index.search(q)
+                samples.append(time.perf_counter() - t)
+            samples.sort()
+            p99 = samples[int(len(samples) * 0.99) - 1]
+            self.stdout.write(
+                f"  {q!r:16} median {statistics.median(samples) * 1e6:7.1f} µs   p99 {p99 * 1e6:7.1f} µs"
+            )
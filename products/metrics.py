@@ -0,0 +1,50 @@
+# products/metrics.py
+"""
+عدّادات بسيطة للمراقبة على الكاش المشترك (تجميع بين العمال عند استخدام Redis)،
+مع عدّاد محلي في العملية كاحتياط إذا تعطّل الكاش.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from collections import Counter
+
+from django.core.cache import cache
+
+log = logging.getLogger(__name__)
+
+PREFIX = "metrics:"
+_local = Counter()
+_local_lock = threading.Lock()
+_known: set[str] = set()
+
+
+def incr(name: str, amount: int = 1) -> None:
+    _known.add(name)
+    key = PREFIX + name
+    try:
+        if not cache.add(key, amount, timeout=None):
+            cache.incr(key, amount)
+    except Exception:
+        with _local_lock:
+            _local[name] += amount
+
+
+def snapshot(names=None) -> dict[str, int]:
+    """القيم الحالية (الكاش + الاحتياطي المحلي) للعدّادات المعروفة أو المطلوبة."""
+    names = sorted(names or _known)
+    try:
+        values = cache.get_many([PREFIX + n for n in names])
+    except Exception:
+        values = {}
+    with _local_lock:
+        return {n: values.get(PREFIX + n, 0) + _local[n] for n in names}
+
+
+def reset() -> None:
+    try:
+        cache.delete_many([PREFIX + n for n in _known])
+    except Exception:
+        pass
+    with _local_lock:
+        _local.clear()
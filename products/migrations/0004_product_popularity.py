@@ -0,0 +1,32 @@
+# Generated by Django 5.1.7 on 2026-10-19 18:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_sellrequest_bank_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='click_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='عدد النقرات'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='click_score',
+            field=models.FloatField(default=0, editable=False, verbose_name='نصيب النقرات من الشعبية'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='popularity',
+            field=models.FloatField(default=0, editable=False, verbose_name='درجة الشعبية'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_active', '-popularity', '-created_at'], name='product_popular_idx'),
+        ),
+    ]
@@ -19,11 +19,19 @@ class Product(models.Model):
     store_url = models.URLField(_("رابط صفحة المنتج في المتجر"))
     is_active = models.BooleanField(_("نشط؟"), default=True)
 
+    # درجة "الأكثر طلبًا" — تُحدَّث تزايديًا من products/popularity.py
+    popularity = models.FloatField(_("درجة الشعبية"), default=0, editable=False)
+    click_score = models.FloatField(_("نصيب النقرات من الشعبية"), default=0, editable=False)
+    click_count = models.PositiveIntegerField(_("عدد النقرات"), default=0, editable=False)
+
     created_at = models.DateTimeField(_("أُنشئ في"), auto_now_add=True)
     updated_at = models.DateTimeField(_("عُدّل في"), auto_now=True)
 
     class Meta:
         ordering = ("-created_at",)
+        indexes = [
+            models.Index(fields=["is_active", "-popularity", "-created_at"], name="product_popular_idx"),
+        ]
         verbose_name = _("منتج")
         verbose_name_plural = _("منتجات")
 
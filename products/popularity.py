@@ -0,0 +1,120 @@
+# products/popularity.py
+"""
+درجة "الأكثر طلبًا" مخزّنة على المنتج نفسه (Denormalized) بدل احتسابها
+بـ annotate(Count(...)) في كل عرض للصفحة.
+
+نستخدم التناقص الزمني الأمامي (forward decay): كل حدث يضيف وزنه مضروبًا في
+2 ** ((وقت الحدث - EPOCH) / نصف العمر). بهذا يكون ترتيب القيم المخزّنة مطابقًا
+لترتيب الدرجات المتناقصة زمنيًا في أي لحظة، فلا نحتاج لتحديث كل الصفوف دوريًا
+ويصبح الترتيب مجرد ORDER BY على عمود مفهرس.
+
+مع نصف عمر 14 يومًا يبقى الأس ضمن حدود float لما يقارب 34 سنة من EPOCH؛
+check_half_life يرفض عند الإقلاع أي نصف عمر يقرّب هذا الحد.
+تغيير الأوزان أو نصف العمر يتطلب: python manage.py recompute_popularity
+"""
+from __future__ import annotations
+
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Product, SellRequest
+
+log = logging.getLogger(__name__)
+
+# نقطة الأساس الثابتة للتناقص الأمامي — لا تغيّرها دون إعادة الاحتساب
+EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+# أقصى أس مسموح (2 ** 1024 يفيض float)، مع هامش لجمع أوزان كثيرة
+MAX_EXPONENT = 900
+# أقل مدة متبقية قبل بلوغ MAX_EXPONENT نقبل الإقلاع بها
+HORIZON_MARGIN = timedelta(days=5 * 365)
+
+
+def _half_life_seconds() -> float:
+    return float(getattr(settings, "POPULARITY_HALF_LIFE_DAYS", 14)) * 86400
+
+
+def check_half_life() -> None:
+    """
+    تُستدعى عند الإقلاع: نصف عمر قصير جدًا يجعل 2 ** الأس يفيض (OverflowError)
+    داخل post_save و product_click، فنرفض الإقلاع بدل أخطاء 500 لاحقًا.
+    """
+    half_life = _half_life_seconds()
+    if half_life <= 0:
+        raise ImproperlyConfigured("POPULARITY_HALF_LIFE_DAYS must be positive.")
+    horizon = EPOCH + timedelta(seconds=half_life * MAX_EXPONENT)
+    if horizon < timezone.now() + HORIZON_MARGIN:
+        raise ImproperlyConfigured(
+            f"POPULARITY_HALF_LIFE_DAYS={half_life / 86400:g} overflows the popularity score "
+            f"on {horizon:%Y-%m-%d}; use a longer half-life."
+        )
+
+
+def decayed_weight(weight: float, at: datetime | None = None) -> float:
+    """الوزن بعد تحويله إلى مقياس EPOCH حسب وقت الحدث."""
+    at = at or timezone.now()
+    return weight * 2.0 ** ((at - EPOCH).total_seconds() / _half_life_seconds())
+
+
+def record_sell_request(product_id: int, at: datetime | None = None) -> None:
+    """زيادة ذرّية لدرجة المنتج عند إنشاء طلب بيع."""
+    weight = decayed_weight(getattr(settings, "POPULARITY_SELL_WEIGHT", 5.0), at)
+    Product.objects.filter(pk=product_id).update(popularity=F("popularity") + weight)
+
+
+def record_click(product_id: int, at: datetime | None = None) -> None:
+    """
+    زيادة ذرّية عند الضغط على "اشترِ الآن".
+    نحفظ نصيب النقرات منفصلًا (click_score) لأن النقرات لا تُخزَّن كسجلات
+    ولا يمكن إعادة بنائها من التاريخ عند إعادة الاحتساب.
+    """
+    weight = decayed_weight(getattr(settings, "POPULARITY_CLICK_WEIGHT", 1.0), at)
+    Product.objects.filter(pk=product_id).update(
+        popularity=F("popularity") + weight,
+        click_score=F("click_score") + weight,
+        click_count=F("click_count") + 1,
+    )
+
+
+def recompute_all() -> int:
+    """
+    إعادة بناء الدرجات من سجل طلبات البيع + نصيب النقرات المخزّن.
+    تصحّح الانحراف الناتج عن حذف الطلبات أو تعديلها من لوحة الإدارة.
+    تعيد عدد المنتجات التي حُدّثت.
+
+    نقفل صفوف المنتجات (select_for_update) قبل قراءة السجل وحتى نهاية الكتابة:
+    إدراج طلب بيع جديد يحتاج قفل المفتاح الأجنبي على صف منتجه فينتظر حتى ننتهي،
+    ثم تُضاف زيادته فوق القيمة المعاد حسابها. والطلب المُدرج قبل القفل تكون
+    زيادته قد ثُبّتت معه (الإدراج وpost_save في معاملة واحدة) فيظهر في القراءة.
+    النقرات أيضًا تنتظر القفل ثم تُضاف، وclick_score يُقرأ داخل UPDATE نفسه.
+    """
+    sell_weight = getattr(settings, "POPULARITY_SELL_WEIGHT", 5.0)
+    with transaction.atomic():
+        # ترتيب ثابت للقفل حتى لا يتعارض مع عمليات أخرى تقفل عدة منتجات
+        list(Product.objects.select_for_update().order_by("pk").values_list("pk", flat=True))
+
+        sells: dict[int, float] = defaultdict(float)
+        for product_id, created_at in SellRequest.objects.values_list("product_id", "created_at").iterator():
+            sells[product_id] += decayed_weight(sell_weight, created_at)
+
+        updated = Product.objects.exclude(pk__in=SellRequest.objects.values("product_id")).update(
+            popularity=F("click_score")
+        )
+        for product_id, score in sells.items():
+            updated += Product.objects.filter(pk=product_id).update(popularity=F("click_score") + Value(score))
+    log.info("Popularity recomputed for %s products", updated)
+    return updated
+
+
+@receiver(post_save, sender=SellRequest, dispatch_uid="products_sell_request_popularity")
+def _on_sell_request_saved(sender, instance: SellRequest, created: bool, **kwargs) -> None:
+    if created:
+        record_sell_request(instance.product_id, instance.created_at)
@@ -0,0 +1,283 @@
+# products/search.py
+"""
+فهرس بادئات في الذاكرة لاقتراحات البحث (typeahead) — فهرس واحد لكل عملية.
+
+- الأسماء تُطبَّع عربيًا (حذف التشكيل والتطويل، توحيد الألف/الياء/التاء المربوطة،
+  الأرقام الهندية) ثم تُقسَّم لكلمات.
+- الكلمات مرتبة في قائمة واحدة والبحث بالبادئة عبر bisect؛ قوائم المنتجات لكل
+  كلمة مخزّنة كـ array مضغوطة بترتيب الشعبية، فأفضل N نتيجة هي أول N بعد الدمج.
+- البادئات القصيرة (الأكثر كلفة) محسوبة مسبقًا.
+- الاستعلام متعدد الكلمات تقاطع كامل (النتائج دقيقة مهما كانت الكلمات شائعة):
+  الكلمات/البادئات الكثيفة (تطابق 1/DENSE_FRACTION من المنتجات أو أكثر) محفوظة
+  أيضًا كخريطة بتات (int) فتقاطعها عملية AND في C، والنادرة تُتقاطع كمجموعات
+  تقودها الكلمة الأندر.
+- يُعاد البناء بكسل عند تغيّر نسخة الكتالوج، ونفحص النسخة مرة كل
+  SEARCH_INDEX_CHECK_SECONDS على الأكثر حتى لا يكلّف كل حرف استعلامًا.
+"""
+from __future__ import annotations
+
+import bisect
+import heapq
+import re
+import threading
+import time
+from array import array
+from itertools import islice
+from typing import Iterable
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+from .models import Product
+
+# أقصى عدد اقتراحات يُعاد (ويُحسب مسبقًا للبادئات القصيرة)
+SUGGEST_LIMIT = 10
+# البادئات التي طولها ضمن هذا المدى تُحسب نتائجها مسبقًا
+HOT_PREFIX_LENGTHS = (1, 2, 3)
+# كلمة/بادئة تطابق هذا الكسر من المنتجات أو أكثر تُحفظ أيضًا كخريطة بتات
+# (حجمها n/8 بايت، لا يتجاوز حجم قائمتها array("I") نفسها)
+DENSE_FRACTION = 32
+# نتقاطع مع قائمة كلمة إن لم تتجاوز هذا المضاعف من المرشّحين الحاليين، وإلا نرشّح بالاسم
+INTERSECT_RATIO = 32
+# نتجاهل ما زاد عن هذا العدد من كلمات الاستعلام
+MAX_QUERY_WORDS = 5
+
+_TASHKEEL = re.compile("[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED\u0640]")
+_TRANSLATE = str.maketrans({
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا",
+    "ى": "ي", "ئ": "ي", "ؤ": "و", "ة": "ه",
+    **{chr(0x0660 + i): str(i) for i in range(10)},  # ٠١٢...
+    **{chr(0x06F0 + i): str(i) for i in range(10)},  # ۰۱۲... (فارسية)
+})
+_WORD = re.compile(r"\w+")
+
+
+def normalize_arabic(text: str) -> str:
+    return _TASHKEEL.sub("", text or "").translate(_TRANSLATE).casefold()
+
+
+def tokenize(text: str) -> list[str]:
+    return _WORD.findall(normalize_arabic(text))
+
+
+class PrefixIndex:
+    """
+    فهرس ثابت (غير قابل للتعديل) — يُبنى مرة ثم يُستبدل كاملًا عند التغيير،
+    لذا القراءة آمنة بين الخيوط دون أقفال.
+    """
+
+    __slots__ = (
+        "version", "ids", "names", "norm_names", "tokens", "postings", "offsets", "hot",
+        "dense_min", "token_bits", "prefix_bits",
+    )
+
+    def __init__(self, entries: Iterable[tuple[int, str]], version=None):
+        """entries: أزواج (id, name) مرتبة حسب الأولوية (الأكثر طلبًا أولًا)."""
+        self.version = version
+        ids, names, norm_names = array("q"), [], []
+        postings: dict[str, array] = {}
+        for rank, (pk, name) in enumerate(entries):
+            words = tokenize(name)
+            ids.append(pk)
+            names.append(name)
+            norm_names.append(" " + " ".join(words))
+            for word in dict.fromkeys(words):
+                bucket = postings.get(word)
+                if bucket is None:
+                    bucket = postings[word] = array("I")
+                bucket.append(rank)
+
+        self.ids = ids
+        self.names = names
+        self.norm_names = norm_names
+        self.tokens = sorted(postings)
+        self.postings = [postings[t] for t in self.tokens]
+        # offsets[i] = مجموع أطوال postings قبل الكلمة i — حجم أي نطاق بعملية طرح
+        self.offsets = array("q", [0])
+        for bucket in self.postings:
+            self.offsets.append(self.offsets[-1] + len(bucket))
+        self.hot = self._build_hot()
+        self.dense_min = max(len(ids) // DENSE_FRACTION, 1)
+        # خرائط البتات للكلمات والبادئات القصيرة الكثيفة فقط
+        self.token_bits = {
+            token: self._bitmap(i, i + 1)
+            for i, token in enumerate(self.tokens)
+            if len(self.postings[i]) >= self.dense_min
+        }
+        self.prefix_bits = {
+            prefix: self._bitmap(lo, hi)
+            for prefix, lo, hi in self._prefix_groups()
+            if self.offsets[hi] - self.offsets[lo] >= self.dense_min
+        }
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _token_range(self, prefix: str) -> tuple[int, int]:
+        lo = bisect.bisect_left(self.tokens, prefix)
+        hi = bisect.bisect_left(self.tokens, prefix + "\U0010ffff", lo)
+        return lo, hi
+
+    def _top_ranks(self, lo: int, hi: int) -> Iterable[int]:
+        """ترتيب المنتجات المطابقة لكلمات [lo, hi) تصاعديًا دون تكرار."""
+        last = -1
+        for rank in heapq.merge(*self.postings[lo:hi]):
+            if rank != last:
+                last = rank
+                yield rank
+
+    def _build_hot(self) -> dict[str, array]:
+        hot = {}
+        for prefix, lo, hi in self._prefix_groups():
+            hot[prefix] = array("I", islice(self._top_ranks(lo, hi), SUGGEST_LIMIT))
+        return hot
+
+    def _prefix_groups(self) -> Iterable[tuple[str, int, int]]:
+        """كل بادئة بطول من HOT_PREFIX_LENGTHS مع نطاق كلماتها [lo, hi)."""
+        for length in HOT_PREFIX_LENGTHS:
+            i, n = 0, len(self.tokens)
+            while i < n:
+                prefix = self.tokens[i][:length]
+                lo, hi = i, self._token_range(prefix)[1]
+                if len(prefix) == length:
+                    yield prefix, lo, hi
+                i = hi
+
+    def _bitmap(self, lo: int, hi: int) -> int:
+        """خريطة بتات لمنتجات الكلمات [lo, hi): البت رقم rank = 1 إن طابق المنتج."""
+        buf = bytearray((len(self.ids) + 7) // 8)
+        for bucket in self.postings[lo:hi]:
+            for rank in bucket:
+                buf[rank >> 3] |= 1 << (rank & 7)
+        return int.from_bytes(buf, "little")
+
+    def _word_bitmap(self, word: str, lo: int, hi: int) -> int | None:
+        """خريطة بتات البادئة إن كانت كل كلمات نطاقها كثيفة، وإلا None."""
+        if word in self.prefix_bits:
+            return self.prefix_bits[word]
+        mask = 0
+        for token in self.tokens[lo:hi]:
+            bits = self.token_bits.get(token)
+            if bits is None:
+                return None
+            mask |= bits
+        return mask
+
+    def _intersect(self, ranges) -> set[int]:
+        """كل المنتجات المطابقة لكل الكلمات (بلا خرائط بتات)؛ ranges مرتبة من الأندر."""
+        (_, lo, hi, _), *rest = ranges
+        matches: set[int] = set()
+        for bucket in self.postings[lo:hi]:
+            matches.update(bucket)
+
+        norm = self.norm_names
+        for size, lo, hi, word in rest:
+            if not matches:
+                break
+            if size <= INTERSECT_RATIO * len(matches):
+                hits: set[int] = set()
+                for bucket in self.postings[lo:hi]:
+                    hits.update(matches.intersection(bucket))
+                matches = hits
+            else:
+                # الكلمة شائعة جدًا: أرخص أن نفحص أسماء المرشّحين القلائل
+                needle = " " + word
+                matches = {r for r in matches if needle in norm[r]}
+        return matches
+
+    def search(self, query: str, limit: int = SUGGEST_LIMIT) -> list[tuple[int, str]]:
+        """
+        كل كلمة في الاستعلام تُعامل كبادئة؛ نعيد أفضل limit منتج (بترتيب الشعبية)
+        تطابق كل الكلمات.
+        """
+        words = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_WORDS]
+        if not words:
+            return []
+        limit = max(0, min(limit, SUGGEST_LIMIT))
+
+        ranges = []
+        for word in words:
+            lo, hi = self._token_range(word)
+            if lo == hi:
+                return []
+            ranges.append((self.offsets[hi] - self.offsets[lo], lo, hi, word))
+        ranges.sort()
+        _, lo, hi, driver = ranges[0]
+
+        if len(ranges) == 1:
+            if driver in self.hot:
+                ranks = self.hot[driver][:limit]
+            else:
+                ranks = list(islice(self._top_ranks(lo, hi), limit))
+            return [(self.ids[r], self.names[r]) for r in ranks]
+
+        # الكلمات الكثيفة تُتقاطع كخرائط بتات، والباقي كمجموعات
+        mask, sparse = -1, []
+        for size, lo, hi, word in ranges:
+            bits = self._word_bitmap(word, lo, hi) if size >= self.dense_min else None
+            if bits is None:
+                sparse.append((size, lo, hi, word))
+            else:
+                mask &= bits
+
+        if not sparse:
+            ranks = []
+            while mask and len(ranks) < limit:
+                low = mask & -mask
+                ranks.append(low.bit_length() - 1)
+                mask ^= low
+        else:
+            matches = self._intersect(sparse)
+            if mask != -1 and matches:
+                bits = mask.to_bytes((len(self.ids) + 7) // 8, "little")
+                matches = [r for r in matches if bits[r >> 3] >> (r & 7) & 1]
+            ranks = heapq.nsmallest(limit, matches)
+        return [(self.ids[r], self.names[r]) for r in ranks]
+
+
+# ===== الفهرس الخاص بهذه العملية =====
+_lock = threading.Lock()
+_index: PrefixIndex | None = None
+_checked_at = 0.0
+
+
+def catalog_version() -> tuple:
+    """
+    نسخة الكتالوج: عدد المنتجات + آخر تعديل. أي حفظ من لوحة الإدارة يغيّر updated_at،
+    والحذف يغيّر العدد. تحديثات الشعبية (update) لا تغيّرها عمدًا.
+    """
+    agg = Product.objects.aggregate(n=Count("id"), last=Max("updated_at"))
+    return agg["n"], agg["last"]
+
+
+def _build(version) -> PrefixIndex:
+    rows = (
+        Product.objects.filter(is_active=True)
+        .order_by("-popularity", "-created_at")
+        .values_list("id", "name")
+    )
+    return PrefixIndex(rows.iterator(), version=version)
+
+
+def get_index() -> PrefixIndex:
+    """يعيد الفهرس الحالي ويعيد بناءه بكسل إذا تغيّرت نسخة الكتالوج."""
+    global _index, _checked_at
+    ttl = getattr(settings, "SEARCH_INDEX_CHECK_SECONDS", 30)
+    index = _index
+    if index is not None and time.monotonic() - _checked_at < ttl:
+        return index
+
+    with _lock:
+        if _index is not None and time.monotonic() - _checked_at < ttl:
+            return _index
+        version = catalog_version()
+        if _index is None or _index.version != version:
+            _index = _build(version)
+        _checked_at = time.monotonic()
+        return _index
+
+
+def invalidate() -> None:
+    """يفرض فحص النسخة عند الطلب التالي (مفيد في الاختبارات)."""
+    global _checked_at
+    _checked_at = 0.0
@@ -1,3 +1,338 @@
-from django.test import TestCase
+import random
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import checks, metrics, throttle, views
+from .models import Product, SellRequest
+from .popularity import check_half_life, decayed_weight, recompute_all
+from .search import PrefixIndex, invalidate, normalize_arabic, tokenize
+
+
+def make_product(name="جهاز", **kwargs):
+    kwargs.setdefault("price", Decimal("1000.00"))
+    kwargs.setdefault("image", "products/test.jpg")
+    kwargs.setdefault("store_url", "https://store.example.com/p")
+    return Product.objects.create(name=name, **kwargs)
+
+
+def make_sell_request(product, **kwargs):
+    kwargs.setdefault("customer_name", "عميل")
+    kwargs.setdefault("phone", "+966500000000")
+    kwargs.setdefault("account_number", "SA0000000000")
+    kwargs.setdefault("bank_name", "الراجحي")
+    kwargs.setdefault("transaction_ref", "TXN-1")
+    kwargs.setdefault("purchase_price", Decimal("1000.00"))
+    kwargs.setdefault("payout_amount", Decimal("700.00"))
+    return SellRequest.objects.create(product=product, **kwargs)
+
+
+class PopularityTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        throttle.RateLimiter._local.clear()
+
+    def test_sell_request_creation_raises_score(self):
+        p = make_product()
+        make_sell_request(p)
+        p.refresh_from_db()
+        self.assertGreater(p.popularity, 0)
+
+    def test_recent_events_outrank_older_ones(self):
+        now = timezone.now()
+        self.assertGreater(decayed_weight(1.0, now), decayed_weight(1.0, now - timedelta(days=30)))
+
+    def test_click_beacon_counts(self):
+        p = make_product()
+        url = reverse("product_click", args=[p.pk])
+        self.assertEqual(self.client.get(url, secure=True).status_code, 405)
+        self.assertEqual(self.client.post(url, secure=True).status_code, 204)
+        p.refresh_from_db()
+        self.assertEqual(p.click_count, 1)
+        self.assertEqual(p.popularity, p.click_score)
+        self.assertIn("Disallow: /p/", self.client.get("/robots.txt", secure=True).content.decode())
+
+    @override_settings(POPULARITY_CLICK_IP_RATE="2/h")
+    def test_click_loop_is_not_counted(self):
+        products = [make_product(f"جهاز {i}") for i in range(3)]
+        for _ in range(5):
+            self.client.post(reverse("product_click", args=[products[0].pk]), secure=True)
+        for p in products[1:]:
+            self.client.post(reverse("product_click", args=[p.pk]), secure=True)
+        counts = [Product.objects.get(pk=p.pk).click_count for p in products]
+        self.assertEqual(counts, [1, 1, 0])
+
+    def test_short_half_life_is_rejected(self):
+        with override_settings(POPULARITY_HALF_LIFE_DAYS=1):
+            with self.assertRaises(ImproperlyConfigured):
+                check_half_life()
+        check_half_life()
+
+    def test_popular_sort(self):
+        quiet = make_product("هادئ")
+        busy = make_product("مطلوب")
+        make_sell_request(busy)
+        resp = self.client.get(reverse("landing"), {"sort": "popular"}, secure=True)
+        self.assertEqual(list(resp.context["products"]), [busy, quiet])
+
+    def test_recompute_drops_deleted_requests(self):
+        p = make_product()
+        other = make_product("مطلوب")
+        make_sell_request(other)
+        expected = Product.objects.get(pk=other.pk).popularity
+        make_sell_request(p).delete()
+
+        out = StringIO()
+        call_command("recompute_popularity", stdout=out)
+        self.assertIn("2", out.getvalue())
+        p.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(p.popularity, 0)
+        self.assertAlmostEqual(other.popularity, expected)
+
+    def test_recompute_keeps_click_share(self):
+        p = make_product()
+        self.client.post(reverse("product_click", args=[p.pk]), secure=True)
+        make_sell_request(p)
+        recompute_all()
+        p.refresh_from_db()
+        self.assertGreater(p.click_score, 0)
+        self.assertAlmostEqual(p.popularity - p.click_score, decayed_weight(5.0, p.sell_requests.get().created_at))
+
+
+class SearchSuggestionTests(TestCase):
+    def test_normalize_arabic(self):
+        self.assertEqual(normalize_arabic("آيفونُ ١٥"), "ايفون 15")
+        self.assertEqual(normalize_arabic("شاشةـ"), "شاشه")
+
+    def test_prefix_search_keeps_rank_order(self):
+        index = PrefixIndex([(1, "آيفون 15 برو"), (2, "ايفون 14"), (3, "ماك بوك برو")])
+        self.assertEqual([pk for pk, _ in index.search("اي")], [1, 2])
+        self.assertEqual([pk for pk, _ in index.search("برو")], [1, 3])
+        self.assertEqual([pk for pk, _ in index.search("بر ماك")], [3])
+        self.assertEqual(index.search("xyz"), [])
+        self.assertEqual(index.search("ايفون xyz"), [])
+        self.assertEqual([pk for pk, _ in index.search("1 ا")], [1, 2])
+        self.assertEqual(len(index.search("ا", limit=1)), 1)
+
+    def test_multi_word_finds_matches_beyond_fast_path(self):
+        entries = (
+            [(i, f"ابيض موديل {i}") for i in range(600)]
+            + [(1000 + i, f"ديل لابتوب {i}") for i in range(600)]
+            + [(9999, "ابيض ديل")]
+        )
+        index = PrefixIndex(entries)
+        self.assertEqual(index.search("ابيض ديل"), [(9999, "ابيض ديل")])
+        self.assertEqual(index.search("ديل ابيض"), [(9999, "ابيض ديل")])
+
+    def test_multi_word_matches_brute_force(self):
+        # كلمات كثيفة (خرائط بتات) وأرقام نادرة (مجموعات) معًا
+        rng = random.Random(7)
+        words = ["ابيض", "اسود", "ديل", "ماك", "بوك", "برو", "مستعمل", "جديد"]
+        entries = [
+            (i, " ".join(rng.sample(words, rng.randint(1, 4))) + f" {rng.randint(1, 300)}")
+            for i in range(3000)
+        ]
+        index = PrefixIndex(entries)
+        for query in ("ابيض ديل", "ا ب", "ماك 1", "12 ب", "ابيض اسود ديل ماك", "مس جد 3"):
+            parts = tokenize(query)
+            expected = [
+                (pk, name) for pk, name in entries
+                if all(any(w.startswith(p) for w in tokenize(name)) for p in parts)
+            ][:10]
+            self.assertEqual(index.search(query), expected, query)
+
+    def test_endpoint_rebuilds_after_catalog_change(self):
+        make_product("سامسونج جالكسي")
+        invalidate()
+        url = reverse("search_suggest")
+        resp = self.client.get(url, {"q": "جال"}, secure=True)
+        self.assertEqual([r["name"] for r in resp.json()["results"]], ["سامسونج جالكسي"])
+
+        make_product("جالكسي تاب", is_active=False)
+        make_product("جالكسي بودز")
+        invalidate()
+        resp = self.client.get(url, {"q": "جال"}, secure=True)
+        self.assertEqual(len(resp.json()["results"]), 2)
+
+
+class StartupProfileTests(TestCase):
+    def test_reports_and_guards_budget(self):
+        out = StringIO()
+        with self.assertRaisesMessage(CommandError, "worker private memory"):
+            call_command("profile_startup", runs=1, top=3, max_rss_mb=0.01, stdout=out)
+        self.assertIn("worker:", out.getvalue())
+        self.assertIn("django", out.getvalue())
+
+    def test_warm_mode_measures_forked_worker(self):
+        out = StringIO()
+        call_command("profile_startup", runs=1, top=1, warm=True, max_boot_ms=0, max_rss_mb=0, stdout=out)
+        self.assertIn("master:", out.getvalue())
+        self.assertIn("after fork", out.getvalue())
+
+
+
+class DeployCheckTests(TestCase):
+    def test_production_requires_cloudinary(self):
+        with override_settings(DEBUG=False, USE_CLOUDINARY=False):
+            self.assertEqual([e.id for e in checks.check_media_storage(None)], ["products.E001"])
+        with override_settings(DEBUG=False, USE_CLOUDINARY=True):
+            self.assertEqual(checks.check_media_storage(None), [])
+
+    def test_production_requires_shared_cache(self):
+        local = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+        shared = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": "redis://x"}}
+        with override_settings(DEBUG=False, CACHES=local):
+            self.assertEqual([e.id for e in checks.check_shared_cache(None)], ["products.E002"])
+        with override_settings(DEBUG=False, CACHES=shared):
+            self.assertEqual(checks.check_shared_cache(None), [])
+
+@override_settings(
+    SELL_THROTTLE_IP_RATE="3/m",
+    SELL_THROTTLE_PHONE_RATE="2/m",
+    SELL_MAX_CONCURRENT_UPLOADS=2,
+    THROTTLE_NUM_PROXIES=0,
+    TELEGRAM_BOT_TOKEN="",
+    TELEGRAM_CHAT_ID="",
+)
+class SellRequestThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        throttle.RateLimiter._local.clear()
+        self.product = make_product()
+        self.url = reverse("sell_request")
+
+    def post(self, ip="10.0.0.1", phone="0500000001"):
+        return self.client.post(self.url, {
+            "product": self.product.pk,
+            "customer_name": "عميل تجريبي",
+            "phone": phone,
+            "account_number": "SA0000000000",
+            "bank_name": "الراجحي",
+            "transaction_ref": "TXN-1234",
+            "purchase_price": "1000",
+        }, REMOTE_ADDR=ip, secure=True)
+
+    def test_ip_burst_is_limited(self):
+        codes = [self.post(phone=f"05000000{i:02d}").status_code for i in range(6)]
+        self.assertEqual(codes, [302, 302, 302, 429, 429, 429])
+        self.assertEqual(SellRequest.objects.count(), 3)
+
+        resp = self.post(phone="0500000099")
+        self.assertGreaterEqual(int(resp["Retry-After"]), 1)
+        self.assertEqual(metrics.snapshot(["sell_request.accepted", "sell_request.rejected.rate_ip"]), {
+            "sell_request.accepted": 3,
+            "sell_request.rejected.rate_ip": 4,
+        })
+
+    def test_phone_limited_across_ips_and_formats(self):
+        codes = [
+            self.post(ip="10.0.0.1", phone="0500000001").status_code,
+            self.post(ip="10.0.0.2", phone="+966500000001").status_code,
+            self.post(ip="10.0.0.3", phone="966500000001").status_code,
+        ]
+        self.assertEqual(codes, [302, 302, 429])
+        self.assertEqual(metrics.snapshot(["sell_request.rejected.rate_phone"])["sell_request.rejected.rate_phone"], 1)
+
+    def test_sliding_window_frees_up_over_time(self):
+        limiter = throttle.RateLimiter("t", "2/m")
+        with mock.patch("products.throttle.time.time", return_value=1000.0):
+            self.assertEqual([limiter.consume("k") == 0 for _ in range(3)], [True, True, False])
+        with mock.patch("products.throttle.time.time", return_value=1030.0):
+            self.assertGreater(limiter.consume("k"), 0)  # النافذة السابقة ما زالت تحتسب
+        with mock.patch("products.throttle.time.time", return_value=1070.0):
+            self.assertEqual([limiter.consume("k") == 0 for _ in range(2)], [True, False])
+
+    @override_settings(SELL_THROTTLE_IP_RATE="3/h", SELL_MAX_CONCURRENT_UPLOADS=50)
+    def test_parallel_burst_from_one_ip_is_rate_limited(self):
+        """20 طلبًا متوازيًا من IP واحد مع تأخير في الكاش: لا يُقبل أكثر من السعة."""
+        barrier = threading.Barrier(20)
+        results = []
+
+        def slow(real):
+            def wrapper(cache_self, *args, **kwargs):
+                time.sleep(0.005)
+                return real(cache_self, *args, **kwargs)
+            return wrapper
+
+        def submit(i):
+            request = RequestFactory().post(self.url, {"phone": f"05000001{i:02d}"}, REMOTE_ADDR="10.0.2.1")
+            barrier.wait(5)
+            results.append(views.create_sell_request(request).status_code)
+
+        with mock.patch("products.views._process_sell_request", return_value=HttpResponse(status=302)), \
+                mock.patch.object(LocMemCache, "get", slow(LocMemCache.get)), \
+                mock.patch.object(LocMemCache, "incr", slow(LocMemCache.incr)):
+            threads = [threading.Thread(target=submit, args=(i,)) for i in range(20)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join(10)
+
+        self.assertEqual(len(results), 20)
+        self.assertEqual(results.count(302), 3)
+        self.assertEqual(results.count(429), 17)
+
+    def test_saturated_uploads_fail_fast(self):
+        with throttle.upload_slot() as first, throttle.upload_slot() as second:
+            self.assertTrue(first and second)
+            resp = self.post()
+        self.assertEqual(resp.status_code, 503)
+        self.assertIn("Retry-After", resp)
+        self.assertEqual(SellRequest.objects.count(), 0)
+        self.assertEqual(self.post().status_code, 302)
+
+    @override_settings(SELL_THROTTLE_IP_RATE="100/m", SELL_THROTTLE_PHONE_RATE="100/m")
+    def test_concurrent_burst_sheds_load(self):
+        """5 طلبات متزامنة فعلًا (خيوط) مع سقف 2: اثنان يُعالَجان والبقية 503 فورًا."""
+        gate = threading.Event()
+        results = []
+
+        def slow_process(request):
+            gate.wait(5)
+            return HttpResponse(status=302)
+
+        def submit(i):
+            request = RequestFactory().post(self.url, {"phone": f"05000000{i:02d}"}, REMOTE_ADDR=f"10.0.1.{i}")
+            results.append(views.create_sell_request(request).status_code)
+
+        with mock.patch("products.views._process_sell_request", side_effect=slow_process):
+            threads = [threading.Thread(target=submit, args=(i,)) for i in range(5)]
+            for t in threads:
+                t.start()
+            deadline = time.monotonic() + 5
+            while len(results) < 3 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            gate.set()
+            for t in threads:
+                t.join(5)
+
+        self.assertEqual(sorted(results), [302, 302, 503, 503, 503])
+        self.assertEqual(metrics.snapshot(["sell_request.rejected.saturated"])["sell_request.rejected.saturated"], 3)
+
+    def test_leases_are_released_after_errors(self):
+        for _ in range(5):
+            with self.assertRaises(RuntimeError), throttle.upload_slot() as acquired:
+                self.assertTrue(acquired)
+                raise RuntimeError
+        with throttle.upload_slot() as first, throttle.upload_slot() as second:
+            self.assertTrue(first and second)
+
+    def test_local_fallback_when_cache_is_down(self):
+        with mock.patch("products.throttle.cache.get", side_effect=ConnectionError), \
+                mock.patch("products.throttle.cache.add", side_effect=ConnectionError):
+            codes = [self.post(phone=f"05000000{i:02d}").status_code for i in range(4)]
+        self.assertEqual(codes, [302, 302, 302, 429])
@@ -0,0 +1,200 @@
+# products/throttle.py
+"""
+حماية نقطة طلبات البيع من الإساءة:
+
+- RateLimiter: حد لكل مفتاح (IP / رقم جوال) بنافذة منزلقة على الكاش المشترك.
+  الحجز ذرّي (cache.incr) فلا تتجاوز موجة طلبات متوازية الحد، وإن تعطّل الكاش
+  نكمل بدلو رموز محلي في الذاكرة بدل فتح الباب أو إغلاقه بالكامل.
+- ConcurrencyLimiter: سقف عام لعدد طلبات الرفع قيد المعالجة في كل العمال؛
+  عند الامتلاء نرفض فورًا (503) بدل أن تتكدّس الطلبات وتشغل كل العمال.
+
+كلاهما يحتاج كاشًا مشتركًا (REDIS_URL) ليكون الحد عامًا لا لكل عملية على حدة؛
+الإعدادات ترفض الإقلاع في الإنتاج بدونه.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+
+log = logging.getLogger(__name__)
+
+_PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+_RATE = re.compile(r"^\s*(\d+)\s*/\s*(\d*)\s*([smhd])\s*$")
+
+# أقصى عدد مفاتيح في الاحتياطي المحلي (الأقدم يُحذف أولًا)
+LOCAL_MAX_KEYS = 10_000
+
+
+def parse_rate(rate: str) -> tuple[int, float]:
+    """ "10/h" أو "5/10m" → (عدد الطلبات، المدة بالثواني)."""
+    m = _RATE.match(rate or "")
+    if not m:
+        raise ValueError(f"Invalid rate: {rate!r}")
+    count, mult, unit = m.groups()
+    return int(count), (int(mult) if mult else 1) * _PERIODS[unit]
+
+
+class RateLimiter:
+    """
+    نافذة منزلقة تقريبية: عدّاد لكل نافذة زمنية بطول المدة، ويُحسب عدد الطلبات
+    في آخر مدة كاملة = النافذة السابقة × الجزء المتبقي منها + النافذة الحالية.
+    الحجز بـ cache.incr (ذرّي في Redis و LocMem): كل طلب متزامن يأخذ رقمًا مختلفًا،
+    فلا يُقبل أكثر من السعة مهما توازت الطلبات. الطلب المرفوض يُعيد حجزه (decr)
+    فلا يطيل الحظر على صاحبه.
+    """
+
+    _local: OrderedDict[str, tuple[float, float]] = OrderedDict()
+    _local_lock = threading.Lock()
+
+    def __init__(self, scope: str, rate: str):
+        self.scope = scope
+        self.capacity, self.period = parse_rate(rate)
+        self.refill = self.capacity / self.period  # للدلو المحلي الاحتياطي: رموز في الثانية
+
+    def _key(self, ident: str) -> str:
+        digest = hashlib.sha1(ident.encode()).hexdigest()  # لا نخزن IP/جوال كنص صريح
+        return f"throttle:{self.scope}:{digest}"
+
+    def _take_shared(self, key: str, now: float) -> float:
+        window, elapsed = divmod(now, self.period)
+        current = f"{key}:{int(window)}"
+        # تبقى النافذة مدتين: الحالية ثم كنافذة سابقة للتي تليها
+        timeout = math.ceil(2 * self.period) + 1
+        cache.add(current, 0, timeout=timeout)
+        try:
+            count = cache.incr(current)
+        except ValueError:  # انتهت صلاحية المفتاح بين add و incr
+            cache.add(current, 0, timeout=timeout)
+            count = cache.incr(current)
+        previous = cache.get(f"{key}:{int(window) - 1}", 0)
+
+        weight = 1 - elapsed / self.period
+        if previous * weight + count <= self.capacity:
+            return 0.0
+        cache.decr(current)
+        if count > self.capacity or not previous:
+            return self.period - elapsed
+        # متى ينخفض نصيب النافذة السابقة بما يكفي لهذا الطلب
+        return self.period * (1 - (self.capacity - count) / previous) - elapsed
+
+    def _take_local(self, state, now: float) -> tuple[tuple[float, float], float]:
+        """دلو رموز محلي: يعيد الحالة الجديدة وزمن الانتظار (0 = مسموح)."""
+        tokens, ts = state if state else (float(self.capacity), now)
+        tokens = min(float(self.capacity), tokens + (now - ts) * self.refill)
+        if tokens >= 1:
+            return (tokens - 1, now), 0.0
+        return (tokens, now), (1 - tokens) / self.refill
+
+    def consume(self, ident: str) -> float:
+        """يحجز طلبًا؛ يعيد 0 إن سُمح به وإلا عدد الثواني قبل المحاولة التالية."""
+        key, now = self._key(ident), time.time()
+        try:
+            return max(0.0, self._take_shared(key, now))
+        except Exception as exc:
+            log.warning("Throttle cache unavailable, using local bucket: %s", exc)
+
+        with self._local_lock:
+            state, wait = self._take_local(self._local.pop(key, None), now)
+            self._local[key] = state
+            while len(self._local) > LOCAL_MAX_KEYS:
+                self._local.popitem(last=False)
+        return wait
+
+
+class ConcurrencyLimiter:
+    """
+    سقف عام للطلبات قيد المعالجة عبر "عقود" (leases): لكل مكان من 0 إلى limit-1
+    مفتاح مستقل يُحجز بـ cache.add (ذرّي، SET NX في Redis) ويُحذف عند الانتهاء.
+    لا عدّاد مشترك يمكن أن ينجرف أو يصبح سالبًا، والعقد العالق من عامل قُتل
+    ينتهي وحده بعد LEASE_TTL. Semaphore محلي احتياطي إذا تعطّل الكاش.
+    """
+
+    # أطول من مهلة gunicorn (30 ث) حتى لا ينتهي عقد طلب ما زال يعمل
+    LEASE_TTL = 90
+
+    def __init__(self, name: str, limit: int):
+        self.prefix = f"throttle:inflight:{name}:"
+        self.limit = limit
+        self._local = threading.BoundedSemaphore(limit)
+
+    def _acquire_lease(self, token: str) -> str | None:
+        start = random.randrange(self.limit)  # توزيع المحاولات على الأماكن
+        for i in range(self.limit):
+            key = f"{self.prefix}{(start + i) % self.limit}"
+            if cache.add(key, token, timeout=self.LEASE_TTL):
+                return key
+        return None
+
+    def _release_lease(self, key: str, token: str) -> None:
+        try:
+            if cache.get(key) == token:  # لا نحذف عقدًا انتهى وأخذه طلب آخر
+                cache.delete(key)
+        except Exception:
+            pass  # ينتهي وحده بعد LEASE_TTL
+
+    @contextmanager
+    def slot(self):
+        """يعطي True إن حُجز مكان، وFalse فورًا (بدون انتظار) عند الامتلاء."""
+        token = uuid.uuid4().hex
+        try:
+            lease = self._acquire_lease(token)
+        except Exception as exc:
+            log.warning("Concurrency cache unavailable, using local semaphore: %s", exc)
+            acquired = self._local.acquire(blocking=False)
+            try:
+                yield acquired
+            finally:
+                if acquired:
+                    self._local.release()
+            return
+
+        try:
+            yield lease is not None
+        finally:
+            if lease is not None:
+                self._release_lease(lease, token)
+
+
+def client_ip(request) -> str:
+    """
+    IP العميل. خلف بروكسي Render يضيف البروكسي IP العميل في آخر X-Forwarded-For،
+    فنأخذ العنصر رقم THROTTLE_NUM_PROXIES من النهاية (ما قبله يتحكم فيه العميل).
+    """
+    proxies = getattr(settings, "THROTTLE_NUM_PROXIES", 0)
+    forwarded = request.META.get("HTTP_X_FORWARDED_FOR", "")
+    if proxies and forwarded:
+        hops = [h.strip() for h in forwarded.split(",") if h.strip()]
+        if hops:
+            return hops[-min(proxies, len(hops))]
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def normalize_phone(phone: str | None) -> str:
+    """توحيد صيغ الجوال (05xxxxxxxx / 9665... / +9665...) حتى لا يُتجاوز الحد بتغيير الصيغة."""
+    digits = re.sub(r"\D", "", phone or "")
+    if digits.startswith("05") and len(digits) == 10:
+        digits = "966" + digits[1:]
+    return digits
+
+
+_upload_limiter: ConcurrencyLimiter | None = None
+
+
+def upload_slot():
+    """سقف معالجة طلبات البيع (رفع الصور + الحفظ + التنبيه) عبر كل العمال."""
+    global _upload_limiter
+    limit = getattr(settings, "SELL_MAX_CONCURRENT_UPLOADS", 4)
+    if _upload_limiter is None or _upload_limiter.limit != limit:
+        _upload_limiter = ConcurrencyLimiter("sell_upload", limit)
+    return _upload_limiter.slot()
@@ -1,41 +1,56 @@
 # products/views.py
 from decimal import Decimal, ROUND_HALF_UP
+import hashlib
 import logging
-import requests  # لإرسال مباشر أثناء التطوير
 
 from django.conf import settings
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.cache import cache
 from django.core.paginator import Paginator
+from django.db import transaction
 from django.db.models import Q
-from django.http import HttpResponseBadRequest
-from django.shortcuts import redirect, render
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse
+from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
+from django.views.decorators.http import require_POST
 
+from . import metrics, throttle
 from .forms import SellRequestForm
 from .models import Product
-
-# نحاول استيراد مرسلات تيليجرام (للإنتاج)
-try:
-    from .notify import (
-        _send_telegram_message_sync,
-        _send_telegram_document_sync,
-        send_telegram_message_async,
-        send_telegram_document_async,
-    )
-except Exception:
-    def _send_telegram_message_sync(*args, **kwargs): return None  # type: ignore
-    def _send_telegram_document_sync(*args, **kwargs): return None  # type: ignore
-    def send_telegram_message_async(*args, **kwargs): return None  # type: ignore
-    def send_telegram_document_async(*args, **kwargs): return None  # type: ignore
+from .popularity import record_click
+from .search import SUGGEST_LIMIT, get_index
 
 log = logging.getLogger(__name__)
 
 
+def _notify():
+    """
+    تحميل مرسلات تيليجرام (للإنتاج) عند أول طلب فقط — requests ثقيلة الاستيراد.
+    مع preload_app تُحمَّل مسبقًا في العملية الأم (config/startup.py).
+    """
+    try:
+        from . import notify
+    except Exception as exc:
+        log.exception("Telegram notify import failed: %s", exc)
+        return None
+    return notify
+
+
 # ===== أدوات مساعدة =====
 def _money(value: Decimal) -> Decimal:
     return Decimal(value).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
 
 
+def _reject(status: int, retry_after: float, text: str, metric: str) -> HttpResponse:
+    """رفض سريع (429/503) مع Retry-After — دون قراءة جسم الطلب أو رفع أي ملف."""
+    metrics.incr(f"sell_request.rejected.{metric}")
+    log.warning("Sell request rejected (%s)", metric)
+    resp = HttpResponse(text, status=status, content_type="text/plain; charset=utf-8")
+    resp["Retry-After"] = str(max(1, round(retry_after)))
+    return resp
+
+
 def _tg_send_direct(text: str, *, caption_path: str | None = None) -> None:
     """
     إرسال مباشر لتليجرام أثناء DEBUG=True فقط.
@@ -47,6 +62,8 @@ def _tg_send_direct(text: str, *, caption_path: str | None = None) -> None:
         log.warning("Telegram DIRECT: missing token/chat_id")
         return
 
+    import requests  # لإرسال مباشر أثناء التطوير
+
     # رسالة نصية
     try:
         resp = requests.post(
@@ -92,7 +109,7 @@ def landing_page(request):
       - q: بحث نصي في الاسم/التفاصيل
       - category: تصفية بالتصنيف
       - max_price: سعر أقصى
-      - sort: ترتيب (newest|price_asc|price_desc)
+      - sort: ترتيب (newest|popular|price_asc|price_desc)
       - page: رقم الصفحة
     """
     q = (request.GET.get("q") or "").strip()
@@ -116,6 +133,9 @@ def landing_page(request):
         qs = qs.order_by("price", "-created_at")
     elif sort == "price_desc":
         qs = qs.order_by("-price", "-created_at")
+    elif sort == "popular":
+        # عمود مخزّن ومفهرس — بنفس كلفة الترتيب بالأحدث
+        qs = qs.order_by("-popularity", "-created_at")
     else:
         qs = qs.order_by("-created_at")
 
@@ -134,9 +154,66 @@ def landing_page(request):
     })
 
 
+# ===== اقتراحات البحث (typeahead) =====
+def search_suggestions(request):
+    """
+    اقتراحات فورية من فهرس البادئات في الذاكرة (بدون استعلام icontains).
+      - q: نص البحث (كل كلمة تُعامل كبادئة)
+      - limit: عدد النتائج (حتى SUGGEST_LIMIT)
+    """
+    q = (request.GET.get("q") or "").strip()[:64]
+    try:
+        limit = int(request.GET.get("limit") or 8)
+    except ValueError:
+        limit = 8
+
+    results = [{"id": pk, "name": name} for pk, name in get_index().search(q, min(limit, SUGGEST_LIMIT))]
+    resp = JsonResponse({"q": q, "results": results}, json_dumps_params={"ensure_ascii": False})
+    resp["Cache-Control"] = "public, max-age=60"
+    return resp
+
+
+# ===== تتبّع النقر على "اشترِ الآن" =====
+@require_POST
+def product_click(request, pk):
+    """
+    يسجّل نقرة للمنتج (ضمن درجة الشعبية). رابط "اشترِ الآن" يذهب للمتجر مباشرة،
+    والصفحة ترسل هذا الطلب عبر navigator.sendBeacon؛ POST فقط حتى لا تغيّر
+    الزواحف أو الجلب المسبق للروابط الدرجة.
+    """
+    product = get_object_or_404(Product.objects.only("id"), pk=pk, is_active=True)
+    if _should_count_click(request, product.pk):
+        record_click(product.pk)
+    return HttpResponse(status=204)
+
+
+def _should_count_click(request, product_id: int) -> bool:
+    """
+    لا نحتسب تكرار نفس IP لنفس المنتج خلال POPULARITY_CLICK_DEDUP_SECONDS،
+    ولا ما يتجاوز POPULARITY_CLICK_IP_RATE — حتى لا يرفع curl في حلقة منتجًا
+    لأعلى "الأكثر طلبًا".
+    """
+    ip = throttle.client_ip(request)
+    key = f"click:{product_id}:{hashlib.sha1(ip.encode()).hexdigest()}"
+    try:
+        if not cache.add(key, 1, timeout=settings.POPULARITY_CLICK_DEDUP_SECONDS):
+            return False
+    except Exception as exc:
+        log.warning("Click dedup cache unavailable, not counting: %s", exc)
+        return False
+    return not throttle.RateLimiter("click_ip", settings.POPULARITY_CLICK_IP_RATE).consume(ip)
+
+
+def robots_txt(request):
+    lines = ["User-agent: *", "Disallow: /p/", "Disallow: /sell/", "Disallow: /ops/", "Disallow: /admin/"]
+    return HttpResponse("\n".join(lines) + "\n", content_type="text/plain")
+
+
 # ===== استقبال نموذج بيع الجهاز =====
 def create_sell_request(request):
     """
+    - يحدّ عدد الطلبات لكل IP ولكل رقم جوال (token bucket)
+    - يرفض فورًا (503) إذا امتلأ سقف المعالجة المتزامنة للرفع
     - يعيد احتساب المبلغ المستحق = 70% من سعر الشراء
     - يحفظ الطلب
     - يرسل تنبيه تيليجرام
@@ -145,8 +222,28 @@ def create_sell_request(request):
     if request.method != "POST":
         return HttpResponseBadRequest("Bad request")
 
+    # فحص الـ IP قبل قراءة جسم الطلب (multipart) حتى يكون الرفض رخيصًا
+    wait = throttle.RateLimiter("sell_ip", settings.SELL_THROTTLE_IP_RATE).consume(throttle.client_ip(request))
+    if wait:
+        return _reject(429, wait, "طلبات كثيرة، حاول لاحقًا.", "rate_ip")
+
+    with throttle.upload_slot() as acquired:
+        if not acquired:
+            return _reject(503, 5, "الخدمة مشغولة حاليًا، حاول بعد قليل.", "saturated")
+
+        phone = throttle.normalize_phone(request.POST.get("phone"))
+        if phone:
+            wait = throttle.RateLimiter("sell_phone", settings.SELL_THROTTLE_PHONE_RATE).consume(phone)
+            if wait:
+                return _reject(429, wait, "طلبات كثيرة لهذا الرقم، حاول لاحقًا.", "rate_phone")
+
+        return _process_sell_request(request)
+
+
+def _process_sell_request(request):
     form = SellRequestForm(request.POST, request.FILES)
     if not form.is_valid():
+        metrics.incr("sell_request.invalid")
         messages.error(request, "تحقق من الحقول وأعد المحاولة.")
         return redirect("landing")
 
@@ -168,7 +265,10 @@ def create_sell_request(request):
     sr = form.save(commit=False)
     sr.purchase_price = purchase_price
     sr.payout_amount = payout
-    sr.save()
+    # الإدراج وزيادة الشعبية (post_save) معًا، حتى لا تراه recompute_all دون زيادته
+    with transaction.atomic():
+        sr.save()
+    metrics.incr("sell_request.accepted")
 
     # نص التنبيه
     admin_url = request.build_absolute_uri(
@@ -197,11 +297,26 @@ def create_sell_request(request):
             _tg_send_direct(msg, caption_path=_path)
         else:
             # إنتاج: عبر notify (غير متزامن)
-            send_telegram_message_async(msg)
-            if getattr(sr, "proof_image", None) and hasattr(sr.proof_image, "path"):
-                send_telegram_document_async(sr.proof_image.path, caption=f"إثبات شراء — {product.name}")
+            notify = _notify()
+            if notify is not None:
+                notify.send_telegram_message_async(msg)
+                if getattr(sr, "proof_image", None) and hasattr(sr.proof_image, "path"):
+                    notify.send_telegram_document_async(sr.proof_image.path, caption=f"إثبات شراء — {product.name}")
     except Exception as exc:
         log.exception("Telegram notify error: %s", exc)
 
     messages.success(request, "تم إرسال الطلب بنجاح. سنقوم بالتواصل معك قريبًا.")
     return redirect("landing")
+
+
+# ===== مراقبة =====
+@staff_member_required
+def sell_request_metrics(request):
+    """عدّادات طلبات البيع المقبولة والمرفوضة (للموظفين فقط)."""
+    return JsonResponse(metrics.snapshot([
+        "sell_request.accepted",
+        "sell_request.invalid",
+        "sell_request.rejected.rate_ip",
+        "sell_request.rejected.rate_phone",
+        "sell_request.rejected.saturated",
+    ]))